@@ -1,63 +1,124 @@
 from pydantic import BaseModel, Field
+from typing import List, NamedTuple
 
-class Advisor(BaseModel):
+# Plain tuple: advisors are fixed config with nothing to validate
+class Advisor(NamedTuple):
     name: str
     strategy: str  # e.g., 'Aggressive', 'Conservative', 'Opportunistic'
 
+class Vote(BaseModel):
+    approve: bool = Field(description="True to approve, False to reject")
+
+class AdvisorVotes(BaseModel):
+    votes: List[Vote] = Field(description="One vote per advisor, in the order the advisors are listed")
+
+# Static game-state block at the very start of the player and advisor prompts.
+# OpenAI caches identical prompt prefixes above 1024 tokens automatically, but per
+# model and with the structured-output schema ahead of the messages, so a prefix
+# is only reused between requests to the same model with the same output schema
+# (e.g. the per-advisor requests for one proposal, or repeats of the same call).
+# The player (gpt-4o, Output) and the advisors (gpt-4o-mini, Vote/AdvisorVotes)
+# never share a cached prefix with each other.
+GAME_STATE_PREFIX = """
+        Here is the current game state:
+
+        Bank:
+        {initial_bank}
+
+        Board:
+        {initial_board}
+
+        Roads:
+        {initial_roads}
+
+        Properties:
+        {initial_properties}
+"""
+
 def generate_advisor_prompt_template():
     """
     Generates a formatted prompt string for an advisor in a Monopoly game, detailing
     the game's current state and the proposed action for evaluation.
 
+    The static game state comes first and the advisor-specific fields last, so the
+    shared prefix can be served from the provider's prompt cache.
+
     Returns:
         str: A prompt template string with placeholders for:
-            - {advisor_name}: The name of the advisor.
-            - {advisor_strategy}: The strategy used by the advisor.
             - {initial_bank}: Initial bank details.
             - {initial_board}: Initial board configuration.
             - {initial_roads}: List of roads.
             - {initial_properties}: List of properties.
+            - {advisor_name}: The name of the advisor.
+            - {advisor_strategy}: The strategy used by the advisor.
             - {proposed_action}: The proposed action made by the leader.
     """
 
-    return """
+    return GAME_STATE_PREFIX + """
         You are {advisor_name}, an advisor with a {advisor_strategy} strategy in a Monopoly game. 
         Your role is to evaluate the leader's proposed action and determine whether to approve or reject it.
 
+        Your Objective:
+        Given the current state of the game and your strategy, evaluate the proposed action and decide 
+        if it aligns with your strategic goals.
+
+        Guidelines:
+        1. Analyze each component of the game state to understand the implications of the proposed action.
+        2. Consider immediate risks, potential opportunities, and the long-term impact of the action.
+        3. Evaluate the alignment of the action with your {advisor_strategy} strategy.
+
+        Instructions:
+        - Do not explain your decision; respond only with your vote: approve or reject the proposed action.
+
         Proposed Action:
         {proposed_action}
+    """
 
-        Here is the current game state:
-
-        Bank:
-        {initial_bank}
+def generate_fused_advisor_prompt_template():
+    """
+    Generates a single prompt string that asks for a vote from every advisor at
+    once, so the game state is only processed once instead of once per advisor.
 
-        Board:
-        {initial_board}
+    Returns:
+        str: A prompt template string with placeholders for:
+            - {initial_bank}: Initial bank details.
+            - {initial_board}: Initial board configuration.
+            - {initial_roads}: List of roads.
+            - {initial_properties}: List of properties.
+            - {advisor_list}: The advisors, one per line (see format_advisor_list).
+            - {proposed_action}: The proposed action made by the leader.
+    """
 
-        Roads:
-        {initial_roads}
+    return GAME_STATE_PREFIX + """
+        You are a panel of advisors in a Monopoly game, each with their own strategy.
+        The panel's role is to evaluate the leader's proposed action and have each advisor
+        determine whether to approve or reject it.
 
-        Properties:
-        {initial_properties}
+        Advisors:
+        {advisor_list}
 
         Your Objective:
-        Given the current state of the game and your strategy, evaluate the proposed action and decide 
-        if it aligns with your strategic goals.
+        For each advisor, given the current state of the game and that advisor's strategy,
+        evaluate the proposed action and decide if it aligns with the advisor's strategic goals.
 
         Guidelines:
         1. Analyze each component of the game state to understand the implications of the proposed action.
         2. Consider immediate risks, potential opportunities, and the long-term impact of the action.
-        3. Evaluate the alignment of the action with your {advisor_strategy} strategy.
+        3. Evaluate each advisor independently, judging only by that advisor's strategy.
 
         Instructions:
-        - Provide your reasoning step-by-step to justify your decision.
-        - Clearly state your final decision: approve or reject the proposed action.
+        - Return exactly one vote per advisor, in the order the advisors are listed.
+        - Do not explain the decisions; respond only with each advisor's vote: approve or reject the proposed action.
+
+        Proposed Action:
+        {proposed_action}
     """
 
+def format_advisor_list(advisors):
+    return "\n        ".join(
+        f"{idx + 1}. {advisor.name}: {advisor.strategy} strategy"
+        for idx, advisor in enumerate(advisors)
+    )
+
 def parse_advisor_response(response):
-    decision = response.decision.lower()
-    if "approve" in decision or "accept" in decision or "yes" in decision:
-        return True
-    else:
-        return False
\ No newline at end of file
+    return response.approve
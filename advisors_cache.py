@@ -0,0 +1,80 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+class AdvisorVoteCache:
+    """
+    Remembers the advisors' votes for proposals that have already been decided, so
+    a proposal seen again under the same property ownership skips the advisor LLM
+    calls, even when cash, positions or the rest of the board differ.
+
+    Entries are keyed on (advisor panel, canonical proposal, property group
+    status). Because the number of distinct proposal templates is far smaller
+    than the number of decisions, most repeated decisions are served from the
+    cache. To avoid drift, every entry is treated as a miss once it has been
+    served `revalidate_every` times, so the advisors are asked again and the entry
+    is refreshed; callers should bypass the LLM response cache for that re-check
+    (see is_due_for_revalidation), otherwise it just returns the old answer.
+
+    The cache is in-memory only and lasts for one run.
+    """
+
+    def __init__(self, revalidate_every: int = 10):
+        self.revalidate_every = revalidate_every
+        self.template_cache: Dict[Tuple[str, str, str], List[Optional[bool]]] = {}
+        self.hit_counts: Dict[Tuple[str, str, str], int] = {}
+
+    @staticmethod
+    def make_key(advisors, proposal: str, property_group_status: str) -> Tuple[str, str, str]:
+        """
+        Builds the cache key for a proposal under a given property ownership.
+
+        Args:
+            advisors (list[Advisor]): The advisor panel voting on the proposal.
+            proposal (str): The action proposed by the player.
+            property_group_status (str): Ownership summary per property group,
+                from get_property_group_status().
+
+        Returns:
+            tuple: (advisor panel, canonical proposal, property group status). The
+                panel lists each advisor's name and strategy in order; the proposal
+                is lowercased with punctuation and repeated whitespace removed.
+        """
+
+        panel = "|".join(f"{advisor.name}:{advisor.strategy}" for advisor in advisors)
+        canonical_proposal = " ".join(re.sub(r"[^\w\s]", " ", proposal.lower()).split())
+        return panel, canonical_proposal, property_group_status
+
+    def is_due_for_revalidation(self, advisors, proposal: str, property_group_status: str) -> bool:
+        """
+        Returns True when the proposal has cached votes that have been served
+        `revalidate_every` times and must be re-checked by the advisors.
+        """
+
+        key = self.make_key(advisors, proposal, property_group_status)
+        return key in self.template_cache and self.hit_counts.get(key, 0) >= self.revalidate_every
+
+    def lookup(self, advisors, proposal: str, property_group_status: str) -> Optional[List[Optional[bool]]]:
+        """
+        Returns the cached votes for the proposal, or None on a miss or when the
+        entry is due to be re-verified by the advisors.
+        """
+
+        key = self.make_key(advisors, proposal, property_group_status)
+        if key not in self.template_cache:
+            return None
+
+        hits = self.hit_counts.get(key, 0)
+        if hits >= self.revalidate_every:
+            return None
+
+        self.hit_counts[key] = hits + 1
+        return self.template_cache[key]
+
+    def store(self, advisors, proposal: str, property_group_status: str, votes: List[Optional[bool]]):
+        """
+        Records the advisors' votes for the proposal, resetting its hit count.
+        """
+
+        key = self.make_key(advisors, proposal, property_group_status)
+        self.template_cache[key] = list(votes)
+        self.hit_counts[key] = 0
@@ -1,23 +1,44 @@
+import asyncio
+import cProfile
+import pstats
+import random
+from functools import lru_cache
+
+import orjson
+import tiktoken
 from dotenv import load_dotenv
 
 from monosim.player import Player
 from monosim.board import get_board, get_roads, get_properties, get_community_chest_cards, get_bank
 from langchain.callbacks import get_openai_callback
+from langchain.globals import set_llm_cache
+from langchain_community.cache import SQLiteCache
 
 # LangChain
 from langchain_openai import ChatOpenAI
-from langchain import OpenAI, LLMChain, PromptTemplate
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+from langchain_core.exceptions import OutputParserException
+from openai import LengthFinishReasonError
 
 # Advisors
-from advisors import Advisor, parse_advisor_response, generate_advisor_prompt_template
+from advisors import (
+    Advisor, Vote, AdvisorVotes, parse_advisor_response, generate_advisor_prompt_template,
+    generate_fused_advisor_prompt_template, format_advisor_list, GAME_STATE_PREFIX
+)
+from advisors_cache import AdvisorVoteCache
 
 # other imports
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 from typing import List
 
 # Load dotenv
 load_dotenv()
 
+# Exact-match response cache: repeated prompts (same game state and proposal)
+# are answered from disk instead of making another LLM round-trip
+set_llm_cache(SQLiteCache(database_path=".langchain.db"))
+
 """### Game Functions
 Wrappers that retrieves relevant game state(s)
 """
@@ -59,24 +80,91 @@ def initialize_game() -> dict:
         "players": [player1, player2] # For now, player 1 always comes first
     }
 
+def _json_default(obj):
+    # orjson handles dicts/lists/scalars natively; fall back for game objects and sets
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return vars(obj)
+
+def to_json(obj) -> str:
+    """
+    Serializes game state to compact JSON in a single native pass via orjson,
+    instead of Python's recursive repr().
+
+    Args:
+        obj: Any game state value (dicts, lists, scalars or game objects).
+
+    Returns:
+        str: The JSON text.
+    """
+
+    return orjson.dumps(obj, default=_json_default, option=orjson.OPT_NON_STR_KEYS).decode()
+
 def get_current_state(players) -> dict:
     """
     Retrieves the current state of each player, including position, owned roads,
     money, mortgaged properties, and other status details.
 
+    The state is laid out as struct-of-arrays: one entry per state attribute,
+    each holding a list indexed by player, which serializes to far fewer objects
+    than one dictionary per player.
+
     Args:
         players (list[Player]): List of Player objects in the game.
 
     Returns:
-        dict: A dictionary containing:
-            - "players": A list of dictionaries, each with a player's state.
+        dict: A dictionary mapping each state attribute (e.g. "position",
+            "money") to a list of that attribute's value for every player,
+            in the same order as `players`.
     """
 
-    current_state = {
-        "players": [{"state": player.get_state()} for player in players]
-    }
+    states = [player.get_state() for player in players]
+    current_state = {key: [state[key] for state in states] for key in states[0]}
     return current_state
 
+def serialize_game_state(game) -> dict:
+    """
+    Serializes the static game components once so they can be reused across
+    every prompt built in the same round.
+
+    Args:
+        game (dict): The game dictionary returned by initialize_game().
+
+    Returns:
+        dict: A dictionary keyed by prompt placeholder:
+            - "initial_bank", "initial_board", "initial_roads", "initial_properties".
+    """
+
+    return {
+        "initial_bank": to_json(game["bank"]),
+        "initial_board": to_json(game["board"]),
+        "initial_roads": to_json(game["roads"]),
+        "initial_properties": to_json(game["properties"])
+    }
+
+def get_property_group_status(game) -> str:
+    """
+    Summarizes who owns what in each colour group (and station/utility group),
+    ignoring cash, positions and everything else in the game state. Used as the
+    board part of the advisor vote cache key, so that many boards share a key.
+
+    Args:
+        game (dict): The game dictionary returned by initialize_game().
+
+    Returns:
+        str: One "group:owner,owner,..." entry per group, sorted by group, with
+            "-" for unowned squares, e.g. "brown:-,player1|red:player2,-,-".
+    """
+
+    groups = {}
+    for name, info in list(game["roads"].items()) + list(game["properties"].items()):
+        group = info.get("color") or info.get("type") or name
+        owner = info.get("owner")
+        owner_name = "-" if owner is None else str(getattr(owner, "name", owner))
+        groups.setdefault(group, []).append(owner_name)
+
+    return "|".join(f"{group}:{','.join(owners)}" for group, owners in sorted(groups.items()))
+
 # Example usage of the above function
 initial_state = initialize_game()
 initial_state["bank"]
@@ -95,6 +183,11 @@ def prompt_template():
     Generates a formatted prompt string for an agent in a Monopoly game, detailing
     the game's current state and guiding strategic decision-making.
 
+    The game state is placed first so that repeated player requests over the same
+    state can be served from the provider's prompt cache. The advisor prompts use
+    the same text, but run on a different model and output schema, so they do not
+    share the player's cached prefix.
+
     Returns:
         str: A prompt template string with placeholders for:
             - {agent_role}: The role of the agent in the game.
@@ -107,20 +200,8 @@ def prompt_template():
         Substitute placeholders to customize the prompt with the game state.
     """
 
-    return  """
-        You are the {agent_role} in a Monopoly game. Here is the current game state:
-
-        Bank:
-        {initial_bank}
-
-        Board:
-        {initial_board}
-
-        Roads:
-        {initial_roads}
-
-        Properties:
-        {initial_properties}
+    return GAME_STATE_PREFIX + """
+        You are the {agent_role} in a Monopoly game.
 
         Players:
         Player 1 and Player 2
@@ -176,21 +257,216 @@ model = ChatOpenAI(model="gpt-4o")
 
 structured_llm = model.with_structured_output(Output)
 
-"""Initialize the game and make arbitrary moves"""
+# Approve/reject is a simple decision, so advisors run on the cheaper model;
+# the player's strategic proposal keeps gpt-4o. Set advisor_model_name to
+# "gpt-4o" to roll back. A vote is only a few tokens of JSON, so decoding is
+# capped tightly.
+advisor_model_name = "gpt-4o-mini"
+advisor_model = ChatOpenAI(model=advisor_model_name, max_tokens=64)
+
+# The same advisor model with the LLM response cache bypassed, used when cached
+# votes are re-verified so the advisors are actually asked again, and for every
+# vote when fresh_advisor_votes is set
+fresh_advisor_model = ChatOpenAI(model=advisor_model_name, max_tokens=64, cache=False)
+
+# Ask the advisors afresh on every run while the player's proposals still come from
+# the response cache, e.g. to compare advisor models on the same proposals
+fresh_advisor_votes = False
+
+# Above this many advisors a fused response risks the output token limit,
+# so each advisor is asked separately instead
+max_fused_advisors = 5
+
+@lru_cache(maxsize=None)
+def get_fused_advisor_chain(use_llm_cache=True):
+    """
+    Builds the pipeline that asks all advisors in a single request on first use.
+    Several votes still need structured JSON, so it uses structured output.
+
+    Args:
+        use_llm_cache (bool): Whether responses may come from the LLM response cache.
+
+    Returns:
+        Runnable: A pipeline from fused advisor prompt variables to AdvisorVotes.
+    """
+
+    llm = advisor_model if use_llm_cache else fresh_advisor_model
+    return (
+        ChatPromptTemplate.from_template(generate_fused_advisor_prompt_template())
+        | llm.with_structured_output(AdvisorVotes)
+    )
 
-game = initialize_game()
+@lru_cache(maxsize=None)
+def get_advisor_chain(use_llm_cache=True):
+    """
+    Builds the per-advisor pipeline on first use. A lone advisor's vote is
+    constrained at the logit level: only the first token of "approve" or "reject"
+    can be generated, so one token is the whole response and no JSON needs to be
+    decoded or parsed.
+
+    The token ids come from tiktoken, which downloads its encoding on first use,
+    so this is only done once the fan-out path is actually taken.
+
+    Args:
+        use_llm_cache (bool): Whether responses may come from the LLM response cache.
+
+    Returns:
+        Runnable: A pipeline from advisor prompt variables to a Vote, or to None
+            when the reply is neither vote token.
+    """
+
+    # The token ids must come from the advisor model's own tokenizer
+    vote_encoding = tiktoken.encoding_for_model(advisor_model_name)
+    approve_token_id = vote_encoding.encode("approve")[0]
+    reject_token_id = vote_encoding.encode("reject")[0]
+    vote_tokens = {
+        vote_encoding.decode([approve_token_id]): Vote(approve=True),
+        vote_encoding.decode([reject_token_id]): Vote(approve=False)
+    }
+
+    llm = advisor_model if use_llm_cache else fresh_advisor_model
+    vote_llm = llm.bind(
+        max_tokens=1,
+        logit_bias={approve_token_id: 100, reject_token_id: 100}
+    )
+    return (
+        ChatPromptTemplate.from_template(generate_advisor_prompt_template())
+        | vote_llm
+        # Anything other than the two vote tokens is no vote, not a rejection
+        | RunnableLambda(lambda message: vote_tokens.get(message.content.strip()))
+    )
+
+async def gather_until_majority(advisor_chain, advisor_inputs) -> list:
+    """
+    Sends every advisor request concurrently and stops waiting once a majority
+    has voted the same way, cancelling the requests still in flight.
+
+    Args:
+        advisor_chain (Runnable): The per-advisor pipeline to invoke.
+        advisor_inputs (list[dict]): One set of advisor prompt variables per advisor.
+
+    Returns:
+        list[Vote | None]: One response per input, in the same order;
+            None for advisors whose request was cancelled or gave no valid vote.
+    """
+
+    tasks = [asyncio.ensure_future(advisor_chain.ainvoke(inputs)) for inputs in advisor_inputs]
+    task_index = {task: idx for idx, task in enumerate(tasks)}
+    responses = [None] * len(tasks)
+    majority = len(tasks) // 2 + 1
+
+    approve_count = reject_count = 0
+    pending = set(tasks)
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            response = task.result()
+            responses[task_index[task]] = response
+            if response is None:
+                continue
+            if parse_advisor_response(response):
+                approve_count += 1
+            else:
+                reject_count += 1
+
+        # The outcome is decided, the remaining votes cannot change it
+        if max(approve_count, reject_count) >= majority:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            break
+
+    return responses
+
+def get_advisor_responses(advisors, proposed_action, game_state_strs, use_llm_cache=True) -> list:
+    """
+    Asks every advisor to vote on the proposed action. Small panels are fused into
+    one request so the game state is prefilled once; larger panels fan out into
+    concurrent per-advisor requests that stop as soon as a majority agrees.
+
+    Args:
+        advisors (list[Advisor]): The advisors voting on the proposal.
+        proposed_action (str): The action proposed by the player.
+        game_state_strs (dict): Serialized game state from serialize_game_state().
+        use_llm_cache (bool): Whether responses may come from the LLM response
+            cache; False forces the advisors to be asked again.
+
+    Returns:
+        list[Vote | None]: One response per advisor, in the same order as
+            `advisors`; None for advisors cut short once the majority was reached
+            or whose reply was not a valid vote.
+    """
+
+    # Fields shared by every advisor
+    shared_inputs = {"proposed_action": proposed_action, **game_state_strs}
+
+    if len(advisors) <= max_fused_advisors:
+        # Fall back to fan-out if the reply was truncated by the advisor token cap,
+        # could not be parsed, or did not hold one vote per advisor
+        try:
+            fused_response = get_fused_advisor_chain(use_llm_cache).invoke(
+                {"advisor_list": format_advisor_list(advisors), **shared_inputs}
+            )
+        except (LengthFinishReasonError, OutputParserException, ValidationError):
+            fused_response = None
+
+        if fused_response is not None and len(fused_response.votes) == len(advisors):
+            return fused_response.votes
+
+    advisor_inputs = [
+        {"advisor_name": advisor.name, "advisor_strategy": advisor.strategy, **shared_inputs}
+        for advisor in advisors
+    ]
+
+    # Votes are independent, so dispatch all advisor requests concurrently
+    return asyncio.run(gather_until_majority(get_advisor_chain(use_llm_cache), advisor_inputs))
 
-player1 = game["players"][0]
-player2 = game["players"][1]
-list_players = [player1, player2]
+"""Initialize the games and make arbitrary moves"""
 
 stop_at_round = 5 # arbitrary number of rounds to play before agent comes in and make a decision (for POC)
+num_games = 1 # independent games, each seeded with its game_id, whose decisions are requested concurrently
+max_concurrent_decisions = 8 # upper bound on player requests in flight at once
+profile_simulation = False # print a cProfile report of the monosim rounds, to find hotspots in player.play()
+
+def simulate_games(num_games, stop_at_round):
+    """
+    Plays each game, one after another, until it needs an agent decision. Each
+    game seeds the random state with its game_id, so the same game_id always
+    produces the same deck, dice rolls and board across runs.
+
+    Args:
+        num_games (int): Number of independent games to simulate.
+        stop_at_round (int): Rounds to play before the agent makes a decision.
+
+    Yields:
+        tuple: (game_id, round_idx, game), where `game` is the dictionary
+            returned by initialize_game().
+    """
+
+    profiler = cProfile.Profile() if profile_simulation else None
+
+    for game_id in range(num_games):
+        random.seed(game_id)
+        game = initialize_game()
+        list_players = game["players"]
+
+        # Only the rounds are profiled, not the LLM work done between yields
+        if profiler:
+            profiler.enable()
+
+        idx_count = 0
+        while not any(player.has_lost() for player in list_players) and idx_count < stop_at_round:
+            for player in list_players:
+                player.play()
+            idx_count += 1
 
-idx_count = 0
-while not player1.has_lost() and not player2.has_lost() and idx_count < stop_at_round:
-    for player in list_players:
-        player.play()
-    idx_count += 1
+        if profiler:
+            profiler.disable()
+
+        yield game_id, idx_count, game
+
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
 
 """injecting variables
 
@@ -201,66 +477,84 @@ while not player1.has_lost() and not player2.has_lost() and idx_count < stop_at_
 
 initial_template = prompt_template()
 
-### Only one turn of the game is played so far
-context = initial_template.format(
-    agent_role="Player 1",  # or as appropriate
-    initial_bank=game["bank"],
-    initial_board=game["board"],
-    initial_roads=game["roads"],
-    initial_properties=game["properties"]
+# Player pipeline; the agent role is fixed for every game, so it is bound once
+player_chain = (
+    ChatPromptTemplate.from_template(initial_template + "\n        {player_state}")
+    .partial(agent_role="Player 1")  # or as appropriate
+    | structured_llm
 )
 
-# Use the callback to measure tokens
-with get_openai_callback() as cb:
-    proposal = structured_llm.invoke(f"${context}. player_state is ${get_current_state(list_players)}")
-
-    proposal_reasoning = proposal.reasoning 
-    proposal_decision = proposal.decision
+# Create advisors
+advisors = [
+    Advisor(name='Advisor A', strategy='Aggressive'),
+    Advisor(name='Advisor B', strategy='Conservative'),
+    Advisor(name='Advisor C', strategy='Opportunistic')
+]
 
-    # Display player's decision
-    print("Player proposal:")
-    print(proposal_decision)
-    print("Player reasoning:")
-    print(proposal_reasoning)
+# Votes for proposals already decided under the same property ownership
+advisor_vote_cache = AdvisorVoteCache()
 
-    print("Turning to advisors for a vote...")
+pending = []
+player_inputs = []
+for game_id, round_idx, game in simulate_games(num_games, stop_at_round):
+    # Serialize the game state once and reuse it for the player and every advisor
+    game_state_strs = serialize_game_state(game)
 
-    # Create advisors
-    advisors = [
-        Advisor(name='Advisor A', strategy='Aggressive'),
-        Advisor(name='Advisor B', strategy='Conservative'),
-        Advisor(name='Advisor C', strategy='Opportunistic')
-    ]
+    pending.append((game_id, round_idx, game_state_strs, get_property_group_status(game)))
+    player_inputs.append(
+        {"player_state": f"player_state is {to_json(get_current_state(game['players']))}", **game_state_strs}
+    )
 
-    votes = []
-    for advisor in advisors:
-        # Prepare prompt for the advisor's LLM
-        advisor_prompt = generate_advisor_prompt_template()
-
-        # Add context to prompt template
-        advisor_context = advisor_prompt.format(
-            advisor_name=advisor.name,
-            advisor_strategy=advisor.strategy,
-            initial_bank=game["bank"],
-            initial_board=game["board"],
-            initial_roads=game["roads"],
-            initial_properties=game["properties"],
-            proposed_action=proposal_decision
-        )
-        
-        # Use the LLM to decide whether to approve or reject the proposal
-        advisor_response = structured_llm.invoke(advisor_context)
-        
-        # Parse the response to get the vote (True for approve, False for reject)
-        vote = parse_advisor_response(advisor_response)
-        votes.append(vote)
-        print(f"{advisor.name} ({advisor.strategy}) votes to {'approve' if vote else 'reject'} the proposal.")
-
-    # Determine if the proposal is accepted
-    if votes.count(True) > votes.count(False):
-        print("Proposal accepted by advisors.")
-    else:
-        print("Proposal rejected by advisors.")
+# Use the callback to measure tokens
+with get_openai_callback() as cb:
+    # Send the games' decision requests concurrently, one request per game
+    proposals = player_chain.batch(
+        player_inputs,
+        config={"max_concurrency": max_concurrent_decisions}
+    )
+
+    for (game_id, round_idx, game_state_strs, property_group_status), proposal in zip(pending, proposals):
+        proposal_reasoning = proposal.reasoning 
+        proposal_decision = proposal.decision
+
+        # Display player's decision
+        print(f"Game {game_id} (after round {round_idx}) player proposal:")
+        print(proposal_decision)
+        print("Player reasoning:")
+        print(proposal_reasoning)
+
+        print("Turning to advisors for a vote...")
+
+        # Reuse the votes from the same proposal under the same property ownership
+        votes = advisor_vote_cache.lookup(advisors, proposal_decision, property_group_status)
+        if votes is None:
+            # A re-check of cached votes must reach the model, not the LLM response cache
+            revalidating = advisor_vote_cache.is_due_for_revalidation(advisors, proposal_decision, property_group_status)
+            advisor_responses = get_advisor_responses(
+                advisors, proposal_decision, game_state_strs,
+                use_llm_cache=not (revalidating or fresh_advisor_votes)
+            )
+
+            # Parse the responses to get the votes (True for approve, False for reject)
+            votes = [
+                None if advisor_response is None else parse_advisor_response(advisor_response)
+                for advisor_response in advisor_responses
+            ]
+            advisor_vote_cache.store(advisors, proposal_decision, property_group_status, votes)
+        else:
+            print("(votes served from the advisor cache)")
+
+        for advisor, vote in zip(advisors, votes):
+            if vote is None:
+                print(f"{advisor.name} ({advisor.strategy}) did not vote.")
+                continue
+            print(f"{advisor.name} ({advisor.strategy}) votes to {'approve' if vote else 'reject'} the proposal.")
+
+        # Determine if the proposal is accepted
+        if votes.count(True) > votes.count(False):
+            print("Proposal accepted by advisors.")
+        else:
+            print("Proposal rejected by advisors.")
 
     print(f"Total Tokens Used: {cb.total_tokens}")
     print(f"Total Cost (USD): ${cb.total_cost}")